@@ -0,0 +1,361 @@
+"""
+Concurrency benchmark of the bot against a local fake Telegram Bot API.
+
+A small aiohttp server in a separate process stands in for api.telegram.org:
+it serves getUpdates, sendMessage, editMessageText, getFile, sendAudio and PDF
+downloads, adding a fixed latency to every call. The real Application from
+bot.build_application polls it, so the configured concurrency, connection pool
+and executor sizes are exercised. gTTS synthesis and Groq rewriting are
+replaced by stubs that sleep for a configurable time; PDF text extraction runs
+for real.
+
+For each count N, the "commands" and "conversions" scenarios queue N updates
+of one kind at once. "mixed" queues N conversions and, while they run, a batch
+of commands. Each kind is reported separately: how many finished, the
+throughput and the latency from queuing until the user got the final reply.
+
+Requires aiohttp in addition to requirements.txt.
+
+Usage: python bench/concurrency_bench.py [--counts 100 1000 2000] [--scenarios mixed]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import logging
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+os.environ.setdefault('BOT_TOKEN', 'bench')
+
+import aiohttp
+from aiohttp import web
+from telegram.ext import Application
+
+import bot
+import handlers
+import utils
+
+TOKEN = '123456:bench'
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot'}
+COMMANDS = ['/start', '/help', '/current_model', 'model_info']  # model_info is a button press
+
+def make_pdf(text_lines):
+    """Build a one-page PDF with the given lines of text."""
+    content = "BT /F1 10 Tf 20 780 Td 12 TL " + " ".join(f"({line}) Tj T*" for line in text_lines) + " ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R "
+        "/Resources << /Font << /F1 5 0 R >> >> >>",
+        f"<< /Length {len(content)} >>\nstream\n{content}\nendstream",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    pdf = "%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += f"{number} 0 obj\n{body}\nendobj\n"
+    xref = len(pdf)
+    pdf += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    pdf += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    pdf += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    return pdf.encode('latin-1')
+
+PDF_BYTES = make_pdf(["The quick brown fox jumps over the lazy dog again and again and again."] * 60)
+
+class FakeBotAPI:
+    """Stand-in for the Telegram Bot API, run in its own process."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.updates = []
+        self.kinds = {}  # chat_id -> 'commands' | 'conversions'
+        self.sent_at = {}  # chat_id -> time the update was queued
+        self.results = {}  # chat_id -> (latency, succeeded)
+        self.message_id = 0
+
+    def enqueue(self, kind, count):
+        now = time.perf_counter()
+        first = len(self.updates) + 1  # update ids and chat ids are 1-based and consecutive
+        for update in make_updates(kind, count, first):
+            self.kinds[update['update_id']] = kind
+            self.sent_at[update['update_id']] = now
+            self.updates.append(update)
+
+    def _message(self, chat_id, **fields):
+        self.message_id += 1
+        return {
+            'message_id': self.message_id, 'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'}, 'from': BOT_USER, **fields
+        }
+
+    def _reply(self, chat_id, text):
+        # "PDF received!" is an acknowledgement; any other reply ends the update
+        if text.startswith("PDF received") or chat_id in self.results:
+            return
+        succeeded = not text.startswith(("Sorry", "❌"))
+        self.results[chat_id] = (time.perf_counter() - self.sent_at[chat_id], succeeded)
+
+    async def get_updates(self, data):
+        offset = int(data.get('offset') or 0)
+        limit = int(data.get('limit') or 100)
+        deadline = time.perf_counter() + min(float(data.get('timeout') or 0), 1.0)
+        start = max(offset - 1, 0)
+        while start >= len(self.updates) and time.perf_counter() < deadline:
+            await asyncio.sleep(0.01)
+        return self.updates[start:start + limit]
+
+    async def handle_method(self, request):
+        method = request.match_info['method']
+        data = dict(await request.post())
+        if method == 'getUpdates':
+            return web.json_response({'ok': True, 'result': await self.get_updates(data)})
+
+        await asyncio.sleep(self.latency)
+        chat_id = int(data.get('chat_id') or 0)
+        if method == 'getMe':
+            result = BOT_USER
+        elif method in ('sendMessage', 'editMessageText'):
+            self._reply(chat_id, data['text'])
+            result = self._message(chat_id, text=data['text'])
+        elif method == 'sendAudio':
+            result = self._message(chat_id, audio={
+                'file_id': 'audio', 'file_unique_id': 'audio', 'duration': 1
+            })
+        elif method == 'getFile':
+            result = {
+                'file_id': data['file_id'], 'file_unique_id': data['file_id'],
+                'file_size': len(PDF_BYTES), 'file_path': 'documents/bench.pdf'
+            }
+        else:  # deleteWebhook, answerCallbackQuery, ...
+            result = True
+        return web.json_response({'ok': True, 'result': result})
+
+    async def handle_file(self, request):
+        await asyncio.sleep(self.latency)
+        return web.Response(body=PDF_BYTES, content_type='application/pdf')
+
+    async def handle_enqueue(self, request):
+        data = await request.json()
+        self.enqueue(data['kind'], data['count'])
+        return web.json_response({'ok': True})
+
+    async def handle_results(self, request):
+        return web.json_response({
+            'queued': len(self.updates),
+            'results': [
+                [self.kinds[chat_id], latency, succeeded]
+                for chat_id, (latency, succeeded) in self.results.items()
+            ]
+        })
+
+    def app(self):
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_route('*', '/bot{token}/{method}', self.handle_method)
+        app.router.add_get('/file/bot{token}/{path:.*}', self.handle_file)
+        app.router.add_post('/control/enqueue', self.handle_enqueue)
+        app.router.add_get('/control/results', self.handle_results)
+        return app
+
+def serve_fake_api(latency, ready):
+    """Run the fake Bot API until the process is terminated; report its port on `ready`."""
+    async def serve():
+        runner = web.AppRunner(FakeBotAPI(latency).app(), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0, backlog=8192)
+        await site.start()
+        ready.put(runner.addresses[0][1])
+        await asyncio.Event().wait()
+
+    logging.getLogger().setLevel(logging.ERROR)
+    asyncio.run(serve())
+
+class FakeGroqClient:
+    """Async Groq client stub that echoes the chunk after a delay."""
+
+    def __init__(self, delay):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        self.delay = delay
+
+    async def create(self, messages, **kwargs):
+        await asyncio.sleep(self.delay)
+        message = SimpleNamespace(content=messages[-1]['content'])
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+def install_stubs(synth_delay, rewrite_delay):
+    """Replace gTTS synthesis and the Groq client with local stubs."""
+    def synthesize(text, chunk_path):
+        time.sleep(synth_delay)  # gTTS blocks its thread for the whole request
+        with open(chunk_path, 'wb') as f:
+            f.write(b'ID3' + bytes(1024))
+        return chunk_path
+
+    utils._synthesize_chunk = synthesize
+    utils.groq_client = FakeGroqClient(rewrite_delay)
+
+def make_updates(kind, count, first=1):
+    """Build `count` updates from distinct users: commands or PDF uploads."""
+    updates = []
+    for i in range(first, first + count):
+        user = {'id': i, 'is_bot': False, 'first_name': f'User{i}'}
+        message = {
+            'message_id': i, 'date': int(time.time()),
+            'chat': {'id': i, 'type': 'private'}, 'from': user
+        }
+        if kind == 'conversions':
+            message['document'] = {
+                'file_id': f'pdf{i}', 'file_unique_id': f'pdf{i}', 'file_name': 'bench.pdf',
+                'mime_type': 'application/pdf', 'file_size': len(PDF_BYTES)
+            }
+            updates.append({'update_id': i, 'message': message})
+            continue
+
+        command = COMMANDS[i % len(COMMANDS)]
+        if command.startswith('/'):
+            message['text'] = command
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(command)}]
+            updates.append({'update_id': i, 'message': message})
+        else:
+            updates.append({'update_id': i, 'callback_query': {
+                'id': str(i), 'from': user, 'chat_instance': str(i), 'data': command,
+                'message': dict(message, **{'from': BOT_USER, 'text': 'menu'})
+            }})
+    return updates
+
+def scenario_plan(name, count, args):
+    """Return the [(seconds to wait, kind, count)] steps of one scenario run."""
+    if name == 'mixed':
+        return [(0, 'conversions', count), (args.mixed_delay, 'commands', args.mixed_commands)]
+    return [(0, name, count)]
+
+async def run_scenario(plan, args):
+    """Start a fake Bot API process, feed it the plan and return per-kind results."""
+    ready = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve_fake_api, args=(args.latency, ready), daemon=True)
+    server.start()
+    try:
+        port = await asyncio.to_thread(ready.get, True, 30)
+        base = f"http://127.0.0.1:{port}"
+        total = sum(count for _, _, count in plan)
+        for user_id in range(1, total + 1):
+            handlers.user_tts_preferences[user_id] = args.model
+
+        application = bot.build_application(
+            Application.builder()
+            .token(TOKEN)
+            .base_url(f"{base}/bot")
+            .base_file_url(f"{base}/file/bot")
+        )
+        async with application, aiohttp.ClientSession() as control:
+            with contextlib.redirect_stdout(io.StringIO()):
+                await bot.post_init(application)
+            await application.start()
+            await application.updater.start_polling(poll_interval=0, timeout=1)
+
+            deadline = time.perf_counter() + args.deadline
+            for delay, kind, count in plan:
+                await asyncio.sleep(delay)
+                async with control.post(f"{base}/control/enqueue", json={'kind': kind, 'count': count}):
+                    pass
+            while True:
+                async with control.get(f"{base}/control/results") as response:
+                    status = await response.json()
+                if len(status['results']) >= total or time.perf_counter() > deadline:
+                    break
+                await asyncio.sleep(0.2)
+
+            await application.updater.stop()
+            await application.stop()
+    finally:
+        server.terminate()
+        server.join()
+
+    results = {kind: [] for _, kind, _ in plan}
+    for kind, latency, succeeded in status['results']:
+        results[kind].append((latency, succeeded))
+    return {kind: (count, results[kind]) for _, kind, count in plan}
+
+def report(label, count, results):
+    latencies = sorted(latency for latency, _ in results)
+    succeeded = sum(1 for _, ok in results if ok)
+    if not latencies:
+        print(f"{label:<22}{count:>7}{0:>6}{count:>6}")
+        return
+    wall = latencies[-1]
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(
+        f"{label:<22}{count:>7}{succeeded:>6}{count - succeeded:>6}{wall:>9.2f}"
+        f"{len(results) / wall:>10.1f}{statistics.median(latencies):>9.2f}"
+        f"{p95:>9.2f}{latencies[-1]:>9.2f}"
+    )
+
+async def run_all(args):
+    for name in args.scenarios:
+        for count in args.counts:
+            results = await run_scenario(scenario_plan(name, count, args), args)
+            for kind, (kind_count, kind_results) in results.items():
+                label = kind if name == kind else f"{name}/{kind}"
+                report(label, kind_count, kind_results)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--counts', type=int, nargs='+', default=[100, 1000, 2000],
+                        help="numbers of simultaneous updates to try")
+    parser.add_argument('--scenarios', nargs='+', default=['commands', 'conversions', 'mixed'],
+                        choices=['commands', 'conversions', 'mixed'],
+                        help="mixed: N conversions, then --mixed-commands commands while they run")
+    parser.add_argument('--mixed-commands', type=int, default=100,
+                        help="commands sent during the mixed scenario")
+    parser.add_argument('--mixed-delay', type=float, default=2.0,
+                        help="seconds between queuing conversions and commands when mixed")
+    parser.add_argument('--model', default='groq', choices=['gtts', 'groq'],
+                        help="TTS model used for conversions")
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help="seconds added to every fake Bot API call")
+    parser.add_argument('--synth', type=float, default=0.2,
+                        help="seconds one stubbed gTTS chunk blocks its thread")
+    parser.add_argument('--rewrite', type=float, default=0.3,
+                        help="seconds one stubbed Groq rewrite takes")
+    parser.add_argument('--deadline', type=float, default=300.0,
+                        help="seconds to wait for all updates of a run")
+    parser.add_argument('--concurrency', type=int, default=bot.MAX_CONCURRENT_UPDATES,
+                        help="override MAX_CONCURRENT_UPDATES")
+    parser.add_argument('--pool-size', type=int, default=bot.CONNECTION_POOL_SIZE,
+                        help="override CONNECTION_POOL_SIZE")
+    parser.add_argument('--conversion-pool-size', type=int,
+                        default=bot.CONVERSION_CONNECTION_POOL_SIZE,
+                        help="override CONVERSION_CONNECTION_POOL_SIZE")
+    parser.add_argument('--pool-timeout', type=float, default=bot.POOL_TIMEOUT,
+                        help="override POOL_TIMEOUT")
+    parser.add_argument('--groq-slots', type=int, default=utils.GROQ_MAX_CONCURRENT_REWRITES,
+                        help="override GROQ_MAX_CONCURRENT_REWRITES")
+    parser.add_argument('--workers', type=int, default=bot.BLOCKING_WORKERS,
+                        help="override BLOCKING_WORKERS")
+    args = parser.parse_args()
+
+    bot.MAX_CONCURRENT_UPDATES = args.concurrency
+    bot.CONNECTION_POOL_SIZE = args.pool_size
+    bot.CONVERSION_CONNECTION_POOL_SIZE = args.conversion_pool_size
+    bot.POOL_TIMEOUT = args.pool_timeout
+    bot.BLOCKING_WORKERS = args.workers
+    utils.groq_rewrite_slots = asyncio.Semaphore(args.groq_slots)
+    print(f"concurrency={args.concurrency} pool={args.pool_size} "
+          f"conversion_pool={args.conversion_pool_size} pool_timeout={args.pool_timeout}s "
+          f"workers={args.workers} groq_slots={args.groq_slots} model={args.model} latency={args.latency}s "
+          f"synth={args.synth}s rewrite={args.rewrite}s")
+
+    logging.getLogger().setLevel(logging.ERROR)
+    install_stubs(args.synth, args.rewrite)
+
+    print(f"{'updates':<22}{'N':>7}{'ok':>6}{'fail':>6}{'wall s':>9}{'upd/s':>10}"
+          f"{'p50 s':>9}{'p95 s':>9}{'max s':>9}")
+    asyncio.run(run_all(args))
+
+if __name__ == '__main__':
+    main()
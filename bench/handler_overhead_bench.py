@@ -0,0 +1,162 @@
+"""
+Micro-benchmark of per-update handler overhead for commands and button presses.
+
+Handlers are called with stub updates whose Telegram methods do no I/O, so the
+numbers show only the cost of building replies and dispatching callbacks. The
+pre-template if/elif implementation is included for comparison; it is
+synchronous, so the current handlers also pay for creating a coroutine.
+
+Usage: python bench/handler_overhead_bench.py [iterations]
+"""
+import os
+import sys
+import timeit
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+os.environ.setdefault('BOT_TOKEN', 'bench')
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+import handlers
+from config import AVAILABLE_MODELS
+
+CALLBACK_DATA = ["tts_gtts", "tts_groq", "model_info", "help_info", "back_to_start"]
+
+async def _noop(*args, **kwargs):
+    return None
+
+def _sync_noop(*args, **kwargs):
+    return None
+
+def make_update(data=None, reply=_noop):
+    """Build a stub update with a user, a message and a callback query."""
+    return SimpleNamespace(
+        effective_user=SimpleNamespace(id=1, first_name="Bench"),
+        message=SimpleNamespace(reply_text=reply),
+        callback_query=SimpleNamespace(data=data, answer=reply, edit_message_text=reply),
+    )
+
+def run(coro):
+    """Drive a handler coroutine whose awaits complete immediately."""
+    try:
+        coro.send(None)
+    except StopIteration:
+        pass
+    else:
+        raise RuntimeError("handler suspended; stubs must not do I/O")
+
+# Baseline: replies and keyboards rebuilt per update, if/elif callback dispatch
+def baseline_start(update, context):
+    user = update.effective_user
+    welcome_message = (
+        f"Hi {user.first_name}!\n\n"
+        f"I'm a simple Telegram bot with PDF to MP3 conversion!\n\n"
+        f"🤖 **PDF to MP3 Bot**\n\n"
+        f"**Available Commands:**\n"
+        f"• /start - Show this welcome message\n"
+        f"• /help - Show help information\n"
+        f"• /echo <text> - Echo back your message\n"
+        f"• /pdf2mp3 - Convert PDF to MP3 audio\n"
+        f"• /extract - Extract text from PDF only\n"
+        f"• /tts_model - Choose TTS model\n"
+        f"• /current_model - Show current TTS model\n\n"
+        f"**How to use:**\n"
+        f"1️⃣ Choose your TTS model below\n"
+        f"2️⃣ Send me a PDF file\n"
+        f"3️⃣ Get your MP3 audio!\n\n"
+        f"Choose your TTS model:"
+    )
+    keyboard = [
+        [
+            InlineKeyboardButton("🇺🇸 Google TTS (Free)", callback_data="tts_gtts"),
+            InlineKeyboardButton("🤖 Groq AI (Enhanced)", callback_data="tts_groq")
+        ],
+        [
+            InlineKeyboardButton("ℹ️ Model Info", callback_data="model_info"),
+            InlineKeyboardButton("❓ Help", callback_data="help_info")
+        ]
+    ]
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    update.message.reply_text(welcome_message, reply_markup=reply_markup, parse_mode='Markdown')
+
+def baseline_help_command(update, context):
+    update.message.reply_text(handlers.HELP_TEXT, parse_mode='Markdown')
+
+def baseline_button_callback(update, context):
+    query = update.callback_query
+    query.answer()
+    user_id = update.effective_user.id
+    if query.data in ("tts_gtts", "tts_groq"):
+        model = query.data[4:]
+        handlers.user_tts_preferences[user_id] = model
+        model_info = AVAILABLE_MODELS[model]
+        features_text = "\n".join([f"• {feature}" for feature in model_info['features']])
+        query.edit_message_text(
+            f"✅ **{model_info['name']} Selected!**\n\n"
+            f"{model_info['emoji']} **{model_info['name']}{' (llama-3.1-8b-instant)' if model == 'groq' else ''}**\n"
+            f"{features_text}\n\n"
+            f"Send me a PDF file to convert to MP3!",
+            parse_mode='Markdown'
+        )
+    elif query.data == "model_info":
+        gtts_info = AVAILABLE_MODELS['gtts']
+        groq_info = AVAILABLE_MODELS['groq']
+        gtts_features = "\n".join([f"• ✅ {feature}" for feature in gtts_info['features']])
+        groq_features = "\n".join([f"• ✅ {feature}" for feature in groq_info['features']])
+        query.edit_message_text(
+            f"**TTS Model Information**\n\n"
+            f"{gtts_info['emoji']} **{gtts_info['name']} (gTTS)**\n"
+            f"{gtts_features}\n\n"
+            f"{groq_info['emoji']} **{groq_info['name']} (llama-3.1-8b-instant)**\n"
+            f"{groq_features}\n\n"
+            f"Choose your preferred model:",
+            reply_markup=InlineKeyboardMarkup([
+                [InlineKeyboardButton("🇺🇸 Google TTS", callback_data="tts_gtts"),
+                 InlineKeyboardButton("🤖 Groq AI", callback_data="tts_groq")],
+                [InlineKeyboardButton("🔙 Back", callback_data="back_to_start")]
+            ]),
+            parse_mode='Markdown'
+        )
+    elif query.data == "help_info":
+        query.edit_message_text(
+            handlers.HELP_INFO_TEXT,
+            reply_markup=InlineKeyboardMarkup([
+                [InlineKeyboardButton("🇺🇸 Google TTS", callback_data="tts_gtts"),
+                 InlineKeyboardButton("🤖 Groq AI", callback_data="tts_groq")],
+                [InlineKeyboardButton("ℹ️ Model Info", callback_data="model_info"),
+                 InlineKeyboardButton("🔙 Back", callback_data="back_to_start")]
+            ]),
+            parse_mode='Markdown'
+        )
+    elif query.data == "back_to_start":
+        baseline_start(SimpleNamespace(
+            effective_user=update.effective_user,
+            message=SimpleNamespace(reply_text=query.edit_message_text)
+        ), context)
+
+def measure(func, number):
+    """Return the best per-call time in microseconds over a few repeats."""
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+def main() -> None:
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    cases = [
+        ("start", handlers.start, baseline_start, None),
+        ("help", handlers.help_command, baseline_help_command, None),
+    ] + [
+        (f"button:{data}", handlers.button_callback, baseline_button_callback, data)
+        for data in CALLBACK_DATA
+    ]
+
+    print(f"{'handler':<22}{'templates (us)':>16}{'baseline (us)':>16}{'speedup':>10}")
+    for name, handler, baseline, data in cases:
+        update = make_update(data)
+        baseline_update = make_update(data, reply=_sync_noop)
+        current = measure(lambda: run(handler(update, None)), number)
+        previous = measure(lambda: baseline(baseline_update, None), number)
+        print(f"{name:<22}{current:>16.2f}{previous:>16.2f}{previous / current:>9.1f}x")
+
+if __name__ == '__main__':
+    main()
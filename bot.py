@@ -1,15 +1,23 @@
 """
 Main Telegram PDF to MP3 Bot
 """
+import asyncio
 import logging
 import os
-from telegram.ext import Updater, CommandHandler, MessageHandler, Filters, CallbackQueryHandler
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from telegram.error import TimedOut
+from telegram.ext import Application, CommandHandler, MessageHandler, filters, CallbackQueryHandler
+from telegram.request import BaseRequest, HTTPXRequest
 
-from config import BOT_TOKEN
+from config import (
+    BOT_TOKEN, MAX_CONCURRENT_UPDATES, BLOCKING_WORKERS, CONNECTION_POOL_SIZE, POOL_TIMEOUT,
+    CONVERSION_CONNECTION_POOL_SIZE
+)
 from handlers import (
     start, help_command, echo_command, pdf2mp3_command, extract_text_command,
     tts_model_command, current_model_command, button_callback,
-    handle_document, handle_message, error_handler
+    handle_document, handle_message, error_handler, conversion_traffic
 )
 
 # Enable logging
@@ -19,6 +27,124 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+class BoundedHTTPXRequest(HTTPXRequest):
+    """HTTPXRequest that queues requests beyond the pool size before they reach httpx.
+
+    httpx rescans its whole wait queue on every request event, so thousands of
+    requests waiting on its pool slow every Bot API call down. Waiting on a
+    semaphore instead keeps that queue empty; pool_timeout bounds that wait.
+    """
+
+    def __init__(self, connection_pool_size: int, pool_timeout: Optional[float] = None, **kwargs):
+        super().__init__(connection_pool_size=connection_pool_size, pool_timeout=pool_timeout, **kwargs)
+        self._slots = asyncio.Semaphore(connection_pool_size)
+        self._slot_timeout = pool_timeout
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        pool_timeout = kwargs.get('pool_timeout', BaseRequest.DEFAULT_NONE)
+        if pool_timeout is BaseRequest.DEFAULT_NONE:
+            pool_timeout = self._slot_timeout
+
+        try:
+            async with asyncio.timeout(pool_timeout):
+                await self._slots.acquire()
+        except TimeoutError as exc:
+            raise TimedOut(
+                "Pool timeout: all connections are in use. Increase the connection pool size."
+            ) from exc
+
+        try:
+            return await super().do_request(url, method, request_data, **kwargs)
+        finally:
+            self._slots.release()
+
+class LaneRequest(BaseRequest):
+    """Sends PDF conversion traffic and interactive Bot API calls through separate pools.
+
+    A conversion makes several slow requests (file download, audio uploads) plus
+    its own replies. Giving them their own connections keeps command replies
+    and callback answers from queuing behind running conversions.
+    """
+
+    def __init__(self, interactive_request: BaseRequest, conversion_request: BaseRequest):
+        self._interactive_request = interactive_request
+        self._conversion_request = conversion_request
+
+    @property
+    def read_timeout(self):
+        return self._interactive_request.read_timeout
+
+    async def initialize(self) -> None:
+        await asyncio.gather(
+            self._interactive_request.initialize(), self._conversion_request.initialize()
+        )
+
+    async def shutdown(self) -> None:
+        await asyncio.gather(
+            self._interactive_request.shutdown(), self._conversion_request.shutdown()
+        )
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        # File downloads are the only GET requests; uploads carry input files
+        is_transfer = method == 'GET' or (request_data is not None and request_data.contains_files)
+        if is_transfer or conversion_traffic.get():
+            request = self._conversion_request
+        else:
+            request = self._interactive_request
+        return await request.do_request(url, method, request_data, **kwargs)
+
+async def post_init(application: Application) -> None:
+    """Prepare the event loop and test the Telegram connection before polling."""
+    # Blocking library calls (PyPDF2, gTTS) run in this pool via asyncio.to_thread
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=BLOCKING_WORKERS)
+    )
+
+    try:
+        bot_info = await application.bot.get_me()
+        print(f"✅ Connected to Telegram API successfully!")
+        print(f"🤖 Bot username: @{bot_info.username}")
+        print(f"📝 Bot name: {bot_info.first_name}")
+    except Exception as conn_e:
+        print(f"❌ Failed to connect to Telegram API: {conn_e}")
+        logger.error(f"Telegram API connection failed: {conn_e}")
+        raise
+    print("✅ Bot is now running and polling for updates!")
+
+def build_application(builder) -> Application:
+    """Build the Application from a configured builder and register all handlers."""
+    # Updates are handled concurrently on one event loop; their Bot API calls
+    # go through bounded connection pools and wait their turn outside httpx
+    application = (
+        builder
+        .concurrent_updates(MAX_CONCURRENT_UPDATES)
+        .request(LaneRequest(
+            BoundedHTTPXRequest(connection_pool_size=CONNECTION_POOL_SIZE, pool_timeout=POOL_TIMEOUT),
+            BoundedHTTPXRequest(
+                connection_pool_size=CONVERSION_CONNECTION_POOL_SIZE, pool_timeout=POOL_TIMEOUT
+            )
+        ))
+        .post_init(post_init)
+        .build()
+    )
+
+    # Register handlers
+    application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("help", help_command))
+    application.add_handler(CommandHandler("echo", echo_command))
+    application.add_handler(CommandHandler("pdf2mp3", pdf2mp3_command))
+    application.add_handler(CommandHandler("extract", extract_text_command))
+    application.add_handler(CommandHandler("tts_model", tts_model_command))
+    application.add_handler(CommandHandler("current_model", current_model_command))
+    application.add_handler(CallbackQueryHandler(button_callback))
+    application.add_handler(MessageHandler(filters.Document.ALL, handle_document))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+
+    # Register error handler
+    application.add_error_handler(error_handler)
+
+    return application
+
 def main() -> None:
     """Start the bot."""
     # Check if running on Railway (for health checks)
@@ -41,26 +167,7 @@ def main() -> None:
     else:
         print("⚠️  GROQ_TOKEN not found - Groq features will be disabled")
     
-    # Create the Updater
-    updater = Updater(BOT_TOKEN)
-
-    # Get the dispatcher to register handlers
-    dispatcher = updater.dispatcher
-
-    # Register handlers
-    dispatcher.add_handler(CommandHandler("start", start))
-    dispatcher.add_handler(CommandHandler("help", help_command))
-    dispatcher.add_handler(CommandHandler("echo", echo_command))
-    dispatcher.add_handler(CommandHandler("pdf2mp3", pdf2mp3_command))
-    dispatcher.add_handler(CommandHandler("extract", extract_text_command))
-    dispatcher.add_handler(CommandHandler("tts_model", tts_model_command))
-    dispatcher.add_handler(CommandHandler("current_model", current_model_command))
-    dispatcher.add_handler(CallbackQueryHandler(button_callback))
-    dispatcher.add_handler(MessageHandler(Filters.document, handle_document))
-    dispatcher.add_handler(MessageHandler(Filters.text & ~Filters.command, handle_message))
-
-    # Register error handler
-    dispatcher.add_error_handler(error_handler)
+    application = build_application(Application.builder().token(BOT_TOKEN))
 
     # Start the bot
     print("Bot is starting...")
@@ -70,27 +177,12 @@ def main() -> None:
         # Start the Bot with connection retry logic
         print("🔄 Starting polling...")
         
-        # Test connection first
-        try:
-            bot_info = updater.bot.get_me()
-            print(f"✅ Connected to Telegram API successfully!")
-            print(f"🤖 Bot username: @{bot_info.username}")
-            print(f"📝 Bot name: {bot_info.first_name}")
-        except Exception as conn_e:
-            print(f"❌ Failed to connect to Telegram API: {conn_e}")
-            logger.error(f"Telegram API connection failed: {conn_e}")
-            return
-        
-        # Start polling with error handling
-        updater.start_polling(
+        # Run the bot until the user presses Ctrl-C or the process receives SIGINT,
+        # SIGTERM or SIGABRT
+        application.run_polling(
             drop_pending_updates=True,  # Drop any pending updates on restart
             allowed_updates=['message', 'callback_query']  # Only handle these update types
         )
-        print("✅ Bot is now running and polling for updates!")
-
-        # Run the bot until the user presses Ctrl-C or the process receives SIGINT,
-        # SIGTERM or SIGABRT
-        updater.idle()
     except Exception as e:
         print(f"❌ Error starting bot: {e}")
         logger.error(f"Bot startup error: {e}")
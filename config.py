@@ -41,6 +41,15 @@ GTTTS_MAX_CHUNK_LENGTH = 5000
 GROQ_MAX_CHUNK_LENGTH = 2000
 GROQ_MAX_TOKENS = 2000
 GROQ_TEMPERATURE = 0.7
+GROQ_LOOKAHEAD_CHUNKS = 2  # Groq rewrites run ahead of gTTS synthesis (0 disables)
+GROQ_MAX_CONCURRENT_REWRITES = 16  # Groq requests in flight across all conversions
+
+# Concurrency settings
+MAX_CONCURRENT_UPDATES = 2048  # Updates processed at once by the event loop
+BLOCKING_WORKERS = 64  # Threads for blocking calls (PyPDF2, gTTS)
+CONNECTION_POOL_SIZE = 32  # Bot API connections; further requests queue in the bot (see bench/)
+CONVERSION_CONNECTION_POOL_SIZE = 16  # Separate connections for PDF conversions and file transfers
+POOL_TIMEOUT = 30.0  # Seconds a Bot API request may wait for a free connection
 
 # Validation - Only validate BOT_TOKEN if running locally
 if not os.getenv('RAILWAY_ENVIRONMENT'):
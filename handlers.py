@@ -2,10 +2,13 @@
 Bot command and message handlers.
 """
 import os
+import asyncio
+import contextvars
 import tempfile
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import CallbackContext
+from telegram.error import BadRequest, NetworkError, TimedOut
+from telegram.ext import ContextTypes
 from utils import extract_text_from_pdf, text_to_speech
 from config import DEFAULT_TTS_MODEL, AVAILABLE_MODELS
 
@@ -14,45 +17,31 @@ logger = logging.getLogger(__name__)
 # Global variable to store TTS model preference
 user_tts_preferences = {}  # Store user preferences: {user_id: 'gtts' or 'groq'}
 
-def start(update: Update, context: CallbackContext) -> None:
-    """Send a message when the command /start is issued."""
-    user = update.effective_user
-    welcome_message = (
-        f"Hi {user.first_name}!\n\n"
-        f"I'm a simple Telegram bot with PDF to MP3 conversion!\n\n"
-        f"🤖 **PDF to MP3 Bot**\n\n"
-        f"**Available Commands:**\n"
-        f"• /start - Show this welcome message\n"
-        f"• /help - Show help information\n"
-        f"• /echo <text> - Echo back your message\n"
-        f"• /pdf2mp3 - Convert PDF to MP3 audio\n"
-        f"• /extract - Extract text from PDF only\n"
-        f"• /tts_model - Choose TTS model\n"
-        f"• /current_model - Show current TTS model\n\n"
-        f"**How to use:**\n"
-        f"1️⃣ Choose your TTS model below\n"
-        f"2️⃣ Send me a PDF file\n"
-        f"3️⃣ Get your MP3 audio!\n\n"
-        f"Choose your TTS model:"
-    )
-    # Create inline keyboard for TTS model selection
-    keyboard = [
-        [
-            InlineKeyboardButton("🇺🇸 Google TTS (Free)", callback_data="tts_gtts"),
-            InlineKeyboardButton("🤖 Groq AI (Enhanced)", callback_data="tts_groq")
-        ],
-        [
-            InlineKeyboardButton("ℹ️ Model Info", callback_data="model_info"),
-            InlineKeyboardButton("❓ Help", callback_data="help_info")
-        ]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    update.message.reply_text(welcome_message, reply_markup=reply_markup, parse_mode='Markdown')
+# True inside a PDF conversion, so its Bot API calls use the conversion connection lane
+conversion_traffic = contextvars.ContextVar('conversion_traffic', default=False)
 
-def help_command(update: Update, context: CallbackContext) -> None:
-    """Send a message when the command /help is issued."""
-    help_text = """
+# Precomputed reply templates and keyboards. Static texts are rendered once at
+# import time; templates with dynamic fields are filled in with str.format.
+WELCOME_TEMPLATE = (
+    "Hi {first_name}!\n\n"
+    "I'm a simple Telegram bot with PDF to MP3 conversion!\n\n"
+    "🤖 **PDF to MP3 Bot**\n\n"
+    "**Available Commands:**\n"
+    "• /start - Show this welcome message\n"
+    "• /help - Show help information\n"
+    "• /echo <text> - Echo back your message\n"
+    "• /pdf2mp3 - Convert PDF to MP3 audio\n"
+    "• /extract - Extract text from PDF only\n"
+    "• /tts_model - Choose TTS model\n"
+    "• /current_model - Show current TTS model\n\n"
+    "**How to use:**\n"
+    "1️⃣ Choose your TTS model below\n"
+    "2️⃣ Send me a PDF file\n"
+    "3️⃣ Get your MP3 audio!\n\n"
+    "Choose your TTS model:"
+)
+
+HELP_TEXT = """
 **PDF to MP3 Bot Help**
 
 **Commands:**
@@ -98,39 +87,125 @@ def help_command(update: Update, context: CallbackContext) -> None:
 
 Just send me any message or PDF file!
     """
-    update.message.reply_text(help_text, parse_mode='Markdown')
 
-def echo_command(update: Update, context: CallbackContext) -> None:
+HELP_INFO_TEXT = (
+    "**Bot Help**\n\n"
+    "**Commands:**\n"
+    "• /start - Show welcome message\n"
+    "• /help - Show help information\n"
+    "• /pdf2mp3 - Convert PDF to MP3\n"
+    "• /extract - Extract text only\n"
+    "• /tts_model - Choose TTS model\n"
+    "• /current_model - Show current model\n\n"
+    "**How to use:**\n"
+    "1️⃣ Choose your TTS model\n"
+    "2️⃣ Send me a PDF file\n"
+    "3️⃣ Get your MP3 audio!\n\n"
+    "Choose your TTS model:"
+)
+
+CURRENT_MODEL_TEXTS = {
+    model: (
+        f"Current TTS model: {model.upper()}\n"
+        f"Description: {info['emoji']} {info['name']} - {info['description']}\n\n"
+        f"Use /tts_model to change your model."
+    )
+    for model, info in AVAILABLE_MODELS.items()
+}
+
+# Extra detail shown after a model's name when it is selected
+MODEL_NAME_SUFFIXES = {'groq': " (llama-3.1-8b-instant)"}
+
+MODEL_SELECTED_TEXTS = {
+    model: (
+        f"✅ **{info['name']} Selected!**\n\n"
+        f"{info['emoji']} **{info['name']}{MODEL_NAME_SUFFIXES.get(model, '')}**\n"
+        + "\n".join(f"• {feature}" for feature in info['features'])
+        + "\n\nSend me a PDF file to convert to MP3!"
+    )
+    for model, info in AVAILABLE_MODELS.items()
+}
+
+MODEL_INFO_TEXT = (
+    f"**TTS Model Information**\n\n"
+    f"{AVAILABLE_MODELS['gtts']['emoji']} **{AVAILABLE_MODELS['gtts']['name']} (gTTS)**\n"
+    + "\n".join(f"• ✅ {feature}" for feature in AVAILABLE_MODELS['gtts']['features'])
+    + f"\n\n{AVAILABLE_MODELS['groq']['emoji']} **{AVAILABLE_MODELS['groq']['name']} (llama-3.1-8b-instant)**\n"
+    + "\n".join(f"• ✅ {feature}" for feature in AVAILABLE_MODELS['groq']['features'])
+    + "\n\nChoose your preferred model:"
+)
+
+WELCOME_KEYBOARD = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("🇺🇸 Google TTS (Free)", callback_data="tts_gtts"),
+        InlineKeyboardButton("🤖 Groq AI (Enhanced)", callback_data="tts_groq")
+    ],
+    [
+        InlineKeyboardButton("ℹ️ Model Info", callback_data="model_info"),
+        InlineKeyboardButton("❓ Help", callback_data="help_info")
+    ]
+])
+
+MODEL_INFO_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🇺🇸 Google TTS", callback_data="tts_gtts"),
+     InlineKeyboardButton("🤖 Groq AI", callback_data="tts_groq")],
+    [InlineKeyboardButton("🔙 Back", callback_data="back_to_start")]
+])
+
+HELP_INFO_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🇺🇸 Google TTS", callback_data="tts_gtts"),
+     InlineKeyboardButton("🤖 Groq AI", callback_data="tts_groq")],
+    [InlineKeyboardButton("ℹ️ Model Info", callback_data="model_info"),
+     InlineKeyboardButton("🔙 Back", callback_data="back_to_start")]
+])
+
+def render_welcome(first_name) -> str:
+    """Render the welcome message for the given user."""
+    return WELCOME_TEMPLATE.format(first_name=first_name)
+
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Send a message when the command /start is issued."""
+    await update.message.reply_text(
+        render_welcome(update.effective_user.first_name),
+        reply_markup=WELCOME_KEYBOARD,
+        parse_mode='Markdown'
+    )
+
+async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Send a message when the command /help is issued."""
+    await update.message.reply_text(HELP_TEXT, parse_mode='Markdown')
+
+async def echo_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Echo the user message when /echo command is used."""
     if context.args:
         message = ' '.join(context.args)
-        update.message.reply_text(f"Echo: {message}")
+        await update.message.reply_text(f"Echo: {message}")
     else:
-        update.message.reply_text("Please provide a message to echo. Usage: /echo <your message>")
+        await update.message.reply_text("Please provide a message to echo. Usage: /echo <your message>")
 
-def pdf2mp3_command(update: Update, context: CallbackContext) -> None:
+async def pdf2mp3_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle PDF to MP3 conversion command."""
-    update.message.reply_text(
+    await update.message.reply_text(
         "Please send me a PDF file and I'll convert it to MP3 audio!\n\n"
         "Just upload the PDF file and I'll process it automatically using your selected TTS model.\n\n"
         "Note: If you encounter quota issues, the bot will still extract and send you the text content."
     )
 
-def extract_text_command(update: Update, context: CallbackContext) -> None:
+async def extract_text_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle text extraction command."""
-    update.message.reply_text(
+    await update.message.reply_text(
         "Please send me a PDF file and I'll extract the text for you!\n\n"
         "This command only extracts text without converting to audio."
     )
 
-def tts_model_command(update: Update, context: CallbackContext) -> None:
+async def tts_model_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle TTS model selection command."""
     user_id = update.effective_user.id
     
     if not context.args:
         current_model = user_tts_preferences.get(user_id, DEFAULT_TTS_MODEL)
         model_info = AVAILABLE_MODELS[current_model]
-        update.message.reply_text(
+        await update.message.reply_text(
             f"Current TTS model: {current_model.upper()}\n\n"
             f"Usage: /tts_model <gtts|groq>\n\n"
             f"Available models:\n"
@@ -143,161 +218,102 @@ def tts_model_command(update: Update, context: CallbackContext) -> None:
     if model in ['gtts', 'groq']:
         user_tts_preferences[user_id] = model
         model_info = AVAILABLE_MODELS[model]
-        update.message.reply_text(
+        await update.message.reply_text(
             f"✅ TTS model set to: {model.upper()}\n\n"
             f"Your PDF to MP3 conversions will now use {model_info['name']}."
         )
     else:
-        update.message.reply_text(
+        await update.message.reply_text(
             "❌ Invalid model. Please use:\n"
             "• /tts_model gtts - for Google Text-to-Speech\n"
             "• /tts_model groq - for Groq with llama-3.1-8b-instant"
         )
 
-def current_model_command(update: Update, context: CallbackContext) -> None:
+async def current_model_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Show current TTS model."""
     user_id = update.effective_user.id
     current_model = user_tts_preferences.get(user_id, DEFAULT_TTS_MODEL)
-    model_info = AVAILABLE_MODELS[current_model]
-    
-    update.message.reply_text(
-        f"Current TTS model: {current_model.upper()}\n"
-        f"Description: {model_info['emoji']} {model_info['name']} - {model_info['description']}\n\n"
-        f"Use /tts_model to change your model."
+    await update.message.reply_text(CURRENT_MODEL_TEXTS[current_model])
+
+def _select_model_callback(model):
+    """Build a callback that stores the user's TTS model and confirms it."""
+    async def callback(query, update: Update) -> None:
+        user_tts_preferences[update.effective_user.id] = model
+        await query.edit_message_text(MODEL_SELECTED_TEXTS[model], parse_mode='Markdown')
+    return callback
+
+async def _model_info_callback(query, update: Update) -> None:
+    await query.edit_message_text(
+        MODEL_INFO_TEXT,
+        reply_markup=MODEL_INFO_KEYBOARD,
+        parse_mode='Markdown'
+    )
+
+async def _help_info_callback(query, update: Update) -> None:
+    await query.edit_message_text(
+        HELP_INFO_TEXT,
+        reply_markup=HELP_INFO_KEYBOARD,
+        parse_mode='Markdown'
+    )
+
+async def _back_to_start_callback(query, update: Update) -> None:
+    await query.edit_message_text(
+        render_welcome(update.effective_user.first_name),
+        reply_markup=WELCOME_KEYBOARD,
+        parse_mode='Markdown'
     )
 
-def button_callback(update: Update, context: CallbackContext) -> None:
+# Callback data -> handler dispatch table
+CALLBACK_HANDLERS = {
+    "tts_gtts": _select_model_callback('gtts'),
+    "tts_groq": _select_model_callback('groq'),
+    "model_info": _model_info_callback,
+    "help_info": _help_info_callback,
+    "back_to_start": _back_to_start_callback,
+}
+
+async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle button callbacks."""
     query = update.callback_query
-    query.answer()
+    await query.answer()
     
-    user_id = update.effective_user.id
+    handler = CALLBACK_HANDLERS.get(query.data)
+    if handler:
+        await handler(query, update)
+
+async def download_and_extract(bot, file_id):
+    """Download a PDF by file id and return its extracted text."""
+    file = await bot.get_file(file_id)
     
-    if query.data == "tts_gtts":
-        user_tts_preferences[user_id] = 'gtts'
-        model_info = AVAILABLE_MODELS['gtts']
-        features_text = "\n".join([f"• {feature}" for feature in model_info['features']])
-        query.edit_message_text(
-            f"✅ **{model_info['name']} Selected!**\n\n"
-            f"{model_info['emoji']} **{model_info['name']}**\n"
-            f"{features_text}\n\n"
-            f"Send me a PDF file to convert to MP3!",
-            parse_mode='Markdown'
-        )
-    elif query.data == "tts_groq":
-        user_tts_preferences[user_id] = 'groq'
-        model_info = AVAILABLE_MODELS['groq']
-        features_text = "\n".join([f"• {feature}" for feature in model_info['features']])
-        query.edit_message_text(
-            f"✅ **{model_info['name']} Selected!**\n\n"
-            f"{model_info['emoji']} **{model_info['name']} (llama-3.1-8b-instant)**\n"
-            f"{features_text}\n\n"
-            f"Send me a PDF file to convert to MP3!",
-            parse_mode='Markdown'
-        )
-    elif query.data == "model_info":
-        gtts_info = AVAILABLE_MODELS['gtts']
-        groq_info = AVAILABLE_MODELS['groq']
-        
-        gtts_features = "\n".join([f"• ✅ {feature}" for feature in gtts_info['features']])
-        groq_features = "\n".join([f"• ✅ {feature}" for feature in groq_info['features']])
-        
-        query.edit_message_text(
-            f"**TTS Model Information**\n\n"
-            f"{gtts_info['emoji']} **{gtts_info['name']} (gTTS)**\n"
-            f"{gtts_features}\n\n"
-            f"{groq_info['emoji']} **{groq_info['name']} (llama-3.1-8b-instant)**\n"
-            f"{groq_features}\n\n"
-            f"Choose your preferred model:",
-            reply_markup=InlineKeyboardMarkup([
-                [InlineKeyboardButton("🇺🇸 Google TTS", callback_data="tts_gtts"),
-                 InlineKeyboardButton("🤖 Groq AI", callback_data="tts_groq")],
-                [InlineKeyboardButton("🔙 Back", callback_data="back_to_start")]
-            ]),
-            parse_mode='Markdown'
-        )
-    elif query.data == "help_info":
-        query.edit_message_text(
-            "**Bot Help**\n\n"
-            "**Commands:**\n"
-            "• /start - Show welcome message\n"
-            "• /help - Show help information\n"
-            "• /pdf2mp3 - Convert PDF to MP3\n"
-            "• /extract - Extract text only\n"
-            "• /tts_model - Choose TTS model\n"
-            "• /current_model - Show current model\n\n"
-            "**How to use:**\n"
-            "1️⃣ Choose your TTS model\n"
-            "2️⃣ Send me a PDF file\n"
-            "3️⃣ Get your MP3 audio!\n\n"
-            "Choose your TTS model:",
-            reply_markup=InlineKeyboardMarkup([
-                [InlineKeyboardButton("🇺🇸 Google TTS", callback_data="tts_gtts"),
-                 InlineKeyboardButton("🤖 Groq AI", callback_data="tts_groq")],
-                [InlineKeyboardButton("ℹ️ Model Info", callback_data="model_info"),
-                 InlineKeyboardButton("🔙 Back", callback_data="back_to_start")]
-            ]),
-            parse_mode='Markdown'
-        )
-    elif query.data == "back_to_start":
-        # Reset to start message
-        welcome_message = (
-            f"Hi {update.effective_user.first_name}!\n\n"
-            f"I'm a simple Telegram bot with PDF to MP3 conversion!\n\n"
-            f"🤖 **PDF to MP3 Bot**\n\n"
-            f"**Available Commands:**\n"
-            f"• /start - Show this welcome message\n"
-            f"• /help - Show help information\n"
-            f"• /echo <text> - Echo back your message\n"
-            f"• /pdf2mp3 - Convert PDF to MP3 audio\n"
-            f"• /extract - Extract text from PDF only\n"
-            f"• /tts_model - Choose TTS model\n"
-            f"• /current_model - Show current TTS model\n\n"
-            f"**How to use:**\n"
-            f"1️⃣ Choose your TTS model below\n"
-            f"2️⃣ Send me a PDF file\n"
-            f"3️⃣ Get your MP3 audio!\n\n"
-            f"Choose your TTS model:"
-        )
-        keyboard = [
-            [
-                InlineKeyboardButton("🇺🇸 Google TTS (Free)", callback_data="tts_gtts"),
-                InlineKeyboardButton("🤖 Groq AI (Enhanced)", callback_data="tts_groq")
-            ],
-            [
-                InlineKeyboardButton("ℹ️ Model Info", callback_data="model_info"),
-                InlineKeyboardButton("❓ Help", callback_data="help_info")
-            ]
-        ]
-        query.edit_message_text(
-            welcome_message,
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode='Markdown'
-        )
+    # Create temporary file
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_pdf:
+        pdf_path = temp_pdf.name
+    try:
+        await file.download_to_drive(pdf_path)
+        # Extract text from PDF (PyPDF2 is CPU-bound, keep it off the event loop)
+        return await asyncio.to_thread(extract_text_from_pdf, pdf_path)
+    finally:
+        # Clean up PDF file
+        os.unlink(pdf_path)
 
-def handle_document(update: Update, context: CallbackContext) -> None:
+async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle PDF document uploads."""
     document = update.message.document
     
     # Check if it's a PDF file
     if document.mime_type == 'application/pdf':
-        update.message.reply_text("PDF received! Processing...")
+        # Every update runs in its own task, so this only tags this conversion's requests
+        conversion_traffic.set(True)
+        
+        # Start the download before acknowledging so it overlaps the reply round trip
+        extraction = asyncio.create_task(download_and_extract(context.bot, document.file_id))
         
         try:
-            # Download the PDF file
-            file = context.bot.get_file(document.file_id)
-            
-            # Create temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_pdf:
-                file.download(temp_pdf.name)
-                pdf_path = temp_pdf.name
-            
-            # Extract text from PDF
-            text = extract_text_from_pdf(pdf_path)
+            await update.message.reply_text("PDF received! Processing...")
+            text = await extraction
             
             if not text or not text.strip():
-                update.message.reply_text("Sorry, I couldn't extract any text from this PDF. The PDF might be image-based or corrupted.")
-                os.unlink(pdf_path)
+                await update.message.reply_text("Sorry, I couldn't extract any text from this PDF. The PDF might be image-based or corrupted.")
                 return
             
             # Create temporary directory for audio files
@@ -309,7 +325,7 @@ def handle_document(update: Update, context: CallbackContext) -> None:
                 selected_model = user_tts_preferences.get(user_id, DEFAULT_TTS_MODEL)
                 
                 # Convert text to speech using selected model
-                audio_files = text_to_speech(text, audio_path, model=selected_model)
+                audio_files = await text_to_speech(text, audio_path, model=selected_model)
                 
                 if audio_files == "QUOTA_EXCEEDED":
                     model_name = selected_model.upper()
@@ -335,32 +351,36 @@ def handle_document(update: Update, context: CallbackContext) -> None:
                             "Please try again later or use the extracted text below:\n\n"
                             f"📄 Extracted text:\n{text[:1000]}{'...' if len(text) > 1000 else ''}"
                         )
-                    update.message.reply_text(error_msg)
+                    await update.message.reply_text(error_msg)
                 elif audio_files:
                     # Send audio files
                     model_name = selected_model.upper()
                     for audio_file in audio_files:
                         with open(audio_file, 'rb') as f:
-                            update.message.reply_audio(
+                            await update.message.reply_audio(
                                 audio=f,
                                 title=f"PDF Audio - Part {audio_files.index(audio_file) + 1}",
                                 performer=model_name
                             )
                     
-                    update.message.reply_text(f"Successfully converted PDF to MP3 using {model_name}! Sent {len(audio_files)} audio file(s).")
+                    await update.message.reply_text(f"Successfully converted PDF to MP3 using {model_name}! Sent {len(audio_files)} audio file(s).")
                 else:
-                    update.message.reply_text("Sorry, there was an error converting the text to speech.")
-            
-            # Clean up PDF file
-            os.unlink(pdf_path)
+                    await update.message.reply_text("Sorry, there was an error converting the text to speech.")
             
         except Exception as e:
             logger.error(f"Error processing PDF: {e}")
-            update.message.reply_text("Sorry, there was an error processing your PDF file.")
+            await update.message.reply_text("Sorry, there was an error processing your PDF file.")
+        finally:
+            # Also stops the download if this handler fails or is cancelled early
+            if not extraction.done():
+                extraction.cancel()
+            elif not extraction.cancelled():
+                # Mark a failure nobody awaited (e.g. the first reply raised) as handled
+                extraction.exception()
     else:
-        update.message.reply_text("Please send a PDF file for conversion to MP3.")
+        await update.message.reply_text("Please send a PDF file for conversion to MP3.")
 
-def handle_message(update: Update, context: CallbackContext) -> None:
+async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle regular text messages."""
     user_message = update.message.text
     user = update.effective_user
@@ -375,9 +395,9 @@ def handle_message(update: Update, context: CallbackContext) -> None:
     else:
         response = f"You said: '{user_message}'\n\nI'm a simple bot, but I'm listening!"
     
-    update.message.reply_text(response)
+    await update.message.reply_text(response)
 
-def error_handler(update: Update, context: CallbackContext) -> None:
+async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Log the error and send a telegram message to notify the developer."""
     if update is None:
         logger.warning(f'Update is None, error: {context.error}')
@@ -385,9 +405,8 @@ def error_handler(update: Update, context: CallbackContext) -> None:
     
     logger.warning(f'Update {update} caused error {context.error}')
     
-    # Handle specific connection errors
-    error_msg = str(context.error)
-    if "RemoteDisconnected" in error_msg or "Connection aborted" in error_msg:
-        logger.error("Telegram API connection lost. Bot may need to restart.")
-    elif "urllib3 HTTPError" in error_msg:
-        logger.error("HTTP error with Telegram API. Check network connectivity.")
+    # Handle specific connection errors (TimedOut and BadRequest subclass NetworkError)
+    if isinstance(context.error, TimedOut):
+        logger.error("Telegram API request timed out. Check network connectivity and pool size.")
+    elif isinstance(context.error, NetworkError) and not isinstance(context.error, BadRequest):
+        logger.error("Telegram API connection lost. Check network connectivity.")
@@ -2,8 +2,10 @@
 Utility functions for text processing and TTS conversion.
 """
 import os
+import asyncio
 import logging
 import tempfile
+from collections import deque
 import PyPDF2
 from gtts import gTTS
 
@@ -20,12 +22,12 @@ if 'https_proxy' in os.environ:
 
 # Import Groq with error handling
 try:
-    from groq import Groq
+    from groq import AsyncGroq
 except ImportError as e:
     print(f"Warning: Could not import Groq: {e}")
-    Groq = None
+    AsyncGroq = None
 try:
-    from config import GROQ_TOKEN, GTTTS_MAX_CHUNK_LENGTH, GROQ_MAX_CHUNK_LENGTH, GROQ_MAX_TOKENS, GROQ_TEMPERATURE
+    from config import GROQ_TOKEN, GTTTS_MAX_CHUNK_LENGTH, GROQ_MAX_CHUNK_LENGTH, GROQ_MAX_TOKENS, GROQ_TEMPERATURE, GROQ_LOOKAHEAD_CHUNKS, GROQ_MAX_CONCURRENT_REWRITES
 except ImportError as e:
     print(f"Warning: Could not import config: {e}")
     GROQ_TOKEN = None
@@ -33,15 +35,17 @@ except ImportError as e:
     GROQ_MAX_CHUNK_LENGTH = 2000
     GROQ_MAX_TOKENS = 2000
     GROQ_TEMPERATURE = 0.7
+    GROQ_LOOKAHEAD_CHUNKS = 2
+    GROQ_MAX_CONCURRENT_REWRITES = 16
 
 logger = logging.getLogger(__name__)
 
 # Initialize Groq client - only if GROQ_TOKEN is available and valid
 groq_client = None
-if Groq and GROQ_TOKEN and GROQ_TOKEN.strip():
+if AsyncGroq and GROQ_TOKEN and GROQ_TOKEN.strip():
     try:
         # Simple initialization with just API key
-        groq_client = Groq(api_key=GROQ_TOKEN)
+        groq_client = AsyncGroq(api_key=GROQ_TOKEN)
         logger.info("Groq client initialized successfully")
     except Exception as e:
         error_msg = str(e)
@@ -51,11 +55,15 @@ if Groq and GROQ_TOKEN and GROQ_TOKEN.strip():
             logger.warning(f"Failed to initialize Groq client: {e}")
         groq_client = None
 else:
-    if not Groq:
+    if not AsyncGroq:
         logger.warning("Groq library not available, Groq features will be disabled")
     else:
         logger.warning("GROQ_TOKEN not available, Groq features will be disabled")
 
+# Process-wide cap on Groq requests in flight, so lookahead across many
+# documents cannot run into Groq's rate limits
+groq_rewrite_slots = asyncio.Semaphore(GROQ_MAX_CONCURRENT_REWRITES)
+
 def extract_text_from_pdf(pdf_file_path):
     """Extract text from PDF file."""
     try:
@@ -70,7 +78,13 @@ def extract_text_from_pdf(pdf_file_path):
         logger.error(f"Error extracting text from PDF: {e}")
         return None
 
-def text_to_speech_gtts(text, output_path):
+def _synthesize_chunk(text, chunk_path):
+    """Synthesize one chunk with gTTS. Blocking; run it in an executor."""
+    tts = gTTS(text=text, lang='en', slow=False)
+    tts.save(chunk_path)
+    return chunk_path
+
+async def text_to_speech_gtts(text, output_path):
     """Convert text to speech using gTTS (Google Text-to-Speech)."""
     try:
         # Split text into chunks if it's too long (gTTS has limits)
@@ -79,11 +93,9 @@ def text_to_speech_gtts(text, output_path):
         audio_files = []
         for i, chunk in enumerate(chunks):
             if chunk.strip():  # Skip empty chunks
-                # Create gTTS object
-                tts = gTTS(text=chunk, lang='en', slow=False)
-                
                 chunk_path = f"{output_path}_part_{i}.mp3"
-                tts.save(chunk_path)
+                # gTTS is a blocking HTTP client, keep it off the event loop
+                await asyncio.to_thread(_synthesize_chunk, chunk, chunk_path)
                 audio_files.append(chunk_path)
         
         return audio_files
@@ -99,41 +111,61 @@ def text_to_speech_gtts(text, output_path):
             logger.error(f"Error converting text to speech with gTTS: {e}")
             return None
 
-def text_to_speech_groq(text, output_path):
-    """Convert text to speech using Groq with llama-3.1-8b-instant model."""
+async def _rewrite_chunk(chunk):
+    """Rewrite one chunk with Groq into text that reads well aloud."""
+    # Use Groq to generate speech-like text (since Groq doesn't have direct TTS)
+    # We'll use it to enhance the text for better TTS conversion
+    prompt = f"Convert this text into natural speech format, maintaining all important information but making it more conversational and suitable for text-to-speech: {chunk}"
+    
+    async with groq_rewrite_slots:
+        response = await groq_client.chat.completions.create(
+            model="llama-3.1-8b-instant",
+            messages=[
+                {"role": "system", "content": "You are a text-to-speech assistant. Convert the given text into natural, conversational speech format that sounds good when read aloud."},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=GROQ_MAX_TOKENS,
+            temperature=GROQ_TEMPERATURE
+        )
+    
+    return response.choices[0].message.content
+
+async def text_to_speech_groq(text, output_path):
+    """Convert text to speech using Groq with llama-3.1-8b-instant model.
+    
+    Rewriting and synthesis are pipelined: while chunk N is synthesized with
+    gTTS, the Groq rewrites of the next GROQ_LOOKAHEAD_CHUNKS chunks are
+    already running.
+    """
     if not groq_client:
         logger.error("Groq client not initialized. Falling back to gTTS.")
-        return text_to_speech_gtts(text, output_path)
+        return await text_to_speech_gtts(text, output_path)
+    
+    # Split text into chunks if it's too long, skipping empty chunks
+    chunks = [(i, text[start:start+GROQ_MAX_CHUNK_LENGTH])
+              for i, start in enumerate(range(0, len(text), GROQ_MAX_CHUNK_LENGTH))]
+    chunks = [(i, chunk) for i, chunk in chunks if chunk.strip()]
+    
+    pending = deque()  # Rewrite tasks for upcoming chunks, in order
+    next_chunk = 0
+    
+    def schedule_rewrites():
+        nonlocal next_chunk
+        while next_chunk < len(chunks) and len(pending) <= GROQ_LOOKAHEAD_CHUNKS:
+            pending.append(asyncio.create_task(_rewrite_chunk(chunks[next_chunk][1])))
+            next_chunk += 1
     
     try:
-        # Split text into chunks if it's too long
-        chunks = [text[i:i+GROQ_MAX_CHUNK_LENGTH] for i in range(0, len(text), GROQ_MAX_CHUNK_LENGTH)]
-        
         audio_files = []
-        for i, chunk in enumerate(chunks):
-            if chunk.strip():  # Skip empty chunks
-                # Use Groq to generate speech-like text (since Groq doesn't have direct TTS)
-                # We'll use it to enhance the text for better TTS conversion
-                prompt = f"Convert this text into natural speech format, maintaining all important information but making it more conversational and suitable for text-to-speech: {chunk}"
-                
-                response = groq_client.chat.completions.create(
-                    model="llama-3.1-8b-instant",
-                    messages=[
-                        {"role": "system", "content": "You are a text-to-speech assistant. Convert the given text into natural, conversational speech format that sounds good when read aloud."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    max_tokens=GROQ_MAX_TOKENS,
-                    temperature=GROQ_TEMPERATURE
-                )
-                
-                enhanced_text = response.choices[0].message.content
-                
-                # Now use gTTS to convert the enhanced text to speech
-                tts = gTTS(text=enhanced_text, lang='en', slow=False)
-                
-                chunk_path = f"{output_path}_part_{i}.mp3"
-                tts.save(chunk_path)
-                audio_files.append(chunk_path)
+        for i, _ in chunks:
+            # Current chunk plus up to GROQ_LOOKAHEAD_CHUNKS rewrites ahead of it
+            schedule_rewrites()
+            enhanced_text = await pending.popleft()
+            
+            # Now use gTTS to convert the enhanced text to speech
+            chunk_path = f"{output_path}_part_{i}.mp3"
+            await asyncio.to_thread(_synthesize_chunk, enhanced_text, chunk_path)
+            audio_files.append(chunk_path)
         
         return audio_files
     except Exception as e:
@@ -147,10 +179,14 @@ def text_to_speech_groq(text, output_path):
         else:
             logger.error(f"Error converting text to speech with Groq: {e}")
             return None
+    finally:
+        # Drop speculative rewrites that are no longer needed
+        for task in pending:
+            task.cancel()
 
-def text_to_speech(text, output_path, model='gtts'):
+async def text_to_speech(text, output_path, model='gtts'):
     """Convert text to speech using the specified model."""
     if model == 'groq':
-        return text_to_speech_groq(text, output_path)
+        return await text_to_speech_groq(text, output_path)
     else:  # default to gtts
-        return text_to_speech_gtts(text, output_path)
+        return await text_to_speech_gtts(text, output_path)